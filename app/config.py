@@ -1,7 +1,11 @@
 """Настройки конфигурации."""
 
+import logging
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import Field
+from pydantic import Field, model_validator
+
+logger = logging.getLogger(__name__)
 
 
 class Config(BaseSettings):
@@ -21,6 +25,9 @@ class Config(BaseSettings):
     llm_price_per_million_output_tokens: float = Field(
         default=0.600
     )  # цена gpt-4o-mini
+    llm_max_concurrency: int = Field(default=8)  # одновременных запросов к LLM
+    # Кэш ответов LLM между запусками ("" - выключен)
+    llm_cache_dir: str = Field(default="__artifacts__/llm_cache")
 
     # Репозиторий (обязательно)
     repo_path: str
@@ -28,6 +35,21 @@ class Config(BaseSettings):
     target_branch: str
 
     # Настройки ревью
-    prompt_budget_chars: int = Field(default=50000)
+    prompt_budget_tokens: int = Field(default=12000)
+    # Сжатие промптов: 0 - выкл, 1 - пробелы, 2 - пробелы и строки-комментарии
+    prompt_compression_level: int = Field(default=1)
     finalize_batch_size: int = Field(default=4)
     max_stages: int = Field(default=0)  # 0 = без лимита
+
+    # Устарело: бюджет теперь в токенах (PROMPT_BUDGET_TOKENS). Поле читается
+    # только чтобы предупредить о старом .env, а не молча его игнорировать
+    prompt_budget_chars: int | None = Field(default=None)
+
+    @model_validator(mode="after")
+    def _warn_deprecated(self) -> "Config":
+        if self.prompt_budget_chars is not None:
+            logger.warning(
+                "PROMPT_BUDGET_CHARS is no longer supported and is ignored; "
+                f"use PROMPT_BUDGET_TOKENS (current: {self.prompt_budget_tokens})"
+            )
+        return self
@@ -1,16 +1,19 @@
 """Новый пайплайн ревью с диффом веток."""
 
 import asyncio
-import json
 import logging
+import re
+from functools import cached_property
 from pathlib import Path
 from datetime import datetime
 
+import orjson
 from openai import AsyncOpenAI
 
 from app.config import Config
 from app.services.git_service import GitService, BranchDiffResult
 from app.services.entity_service import EntityService
+from app.services.parsed_file_provider import ParsedFileProvider
 from app.services.impact import ImpactService
 from app.services.review_service import ReviewService
 from app.services.llm_service import LLMService
@@ -20,34 +23,75 @@ from app.services.prompts import SUMMARY_PROMPT
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 logger = logging.getLogger(__name__)
 
+# Открывающая строка markdown блока кода в ответе LLM: ```json
+_FENCE_RE = re.compile(r"^```[^\n]*\n")
+
 
 class Pipeline:
     """Новый пайплайн для ревью ветки."""
 
     def __init__(self, config: Config):
         self.config = config
-        self.git_service = GitService(repo_path=config.repo_path)
-        self.entity_service = EntityService(repo_path=config.repo_path)
-        self.impact_service = ImpactService(repo_path=config.repo_path)
         self.review_service = ReviewService()
 
-        # Трекер бюджета
-        self.budget_tracker = BudgetTracker(
-            input_price_per_million=config.llm_price_per_million_input_tokens,
-            output_price_per_million=config.llm_price_per_million_output_tokens,
+    # Сервисы создаются при первом обращении: конструктор Pipeline без побочных
+    # эффектов, а неиспользованные шаги не тратят время на инициализацию
+
+    @cached_property
+    def git_service(self) -> GitService:
+        """Git-сервис репозитория."""
+        return GitService(repo_path=self.config.repo_path)
+
+    @cached_property
+    def parsed_file_provider(self) -> ParsedFileProvider:
+        """
+        Общий провайдер: изменённые файлы читаются и парсятся один раз
+        для извлечения сущностей и импакт-анализа.
+        """
+        return ParsedFileProvider(repo_path=self.config.repo_path)
+
+    @cached_property
+    def entity_service(self) -> EntityService:
+        """Сервис извлечения сущностей."""
+        return EntityService(
+            repo_path=self.config.repo_path, provider=self.parsed_file_provider
+        )
+
+    @cached_property
+    def impact_service(self) -> ImpactService:
+        """Сервис импакт-анализа."""
+        return ImpactService(
+            repo_path=self.config.repo_path, provider=self.parsed_file_provider
+        )
+
+    @cached_property
+    def budget_tracker(self) -> BudgetTracker:
+        """Трекер бюджета."""
+        return BudgetTracker(
+            input_price_per_million=self.config.llm_price_per_million_input_tokens,
+            output_price_per_million=self.config.llm_price_per_million_output_tokens,
         )
 
-        # LLM service
-        client = AsyncOpenAI(api_key=config.llm_api_key, base_url=config.llm_api_url)
-        self.llm_service = LLMService(
-            client=client, model=config.llm_model, budget_tracker=self.budget_tracker
+    @cached_property
+    def llm_service(self) -> LLMService:
+        """LLM-сервис (клиент API создаётся при первом обращении)."""
+        client = AsyncOpenAI(
+            api_key=self.config.llm_api_key, base_url=self.config.llm_api_url
+        )
+        return LLMService(
+            client=client,
+            model=self.config.llm_model,
+            budget_tracker=self.budget_tracker,
+            max_concurrency=self.config.llm_max_concurrency,
+            cache_dir=Path(self.config.llm_cache_dir) if self.config.llm_cache_dir else None,
         )
 
-        # Папка для артефактов текущего ревью
+    @cached_property
+    def artifacts_dir(self) -> Path:
+        """Папка для артефактов текущего ревью (создаётся в run)."""
         branch_name = self.git_service.repo.active_branch.name
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        self.artifacts_dir = Path("__artifacts__") / f"{timestamp}.{branch_name}"
-        self.artifacts_dir.mkdir(parents=True, exist_ok=True)
+        return Path("__artifacts__") / f"{timestamp}.{branch_name}"
 
     async def run(self) -> None:
         """Запустить новый пайплайн."""
@@ -55,6 +99,8 @@ class Pipeline:
         logger.info("║          CODE REVIEW PIPELINE                             ║")
         logger.info("╚═══════════════════════════════════════════════════════════╝")
 
+        self.artifacts_dir.mkdir(parents=True, exist_ok=True)
+
         # Шаг 1: Получаем diff ветки относительно main
         diff_result = await self.get_branch_diff()
         logger.info(
@@ -87,16 +133,23 @@ class Pipeline:
 
         # Шаг 5: Создаём промпты
         prompts = self.review_service.format_prompts(
-            stages, self.config.prompt_budget_chars
+            stages,
+            self.config.prompt_budget_tokens,
+            self.config.llm_model,
+            self.config.prompt_compression_level,
         )
         total_chars = sum(len(p) for p in prompts)
         logger.info(
             f"[5/7] Prompts created: {len(prompts)} packs, {total_chars:,} chars total"
         )
 
-        # Сохраняем промпты
-        for i, prompt in enumerate(prompts, 1):
-            self._save_file(f"{i}.prompt.md", prompt)
+        # Сохраняем промпты (запись в потоках, не блокируя event loop)
+        await asyncio.gather(
+            *[
+                asyncio.to_thread(self._save_bytes, f"{i}.prompt.md", prompt.encode())
+                for i, prompt in enumerate(prompts, 1)
+            ]
+        )
 
         # Шаг 6: Отправляем на ревью
         reviews = await self.review_prompts(prompts)
@@ -105,8 +158,8 @@ class Pipeline:
         final_review = await self.generate_final_summary(reviews)
 
         # Сохраняем результат
-        self._save_file(
-            "review.final.json", json.dumps(final_review, ensure_ascii=False, indent=2)
+        self._save_bytes(
+            "review.final.json", orjson.dumps(final_review, option=orjson.OPT_INDENT_2)
         )
         logger.info(
             f"[7/7] Final review: {len(final_review.get('comments', []))} comments\n"
@@ -158,10 +211,10 @@ class Pipeline:
         )
         logger.info("───────────────────────────────────────────────────────────")
 
-    def _save_file(self, filename: str, content: str) -> None:
-        """Сохранить содержимое в файл в папке текущего ревью."""
+    def _save_bytes(self, filename: str, data: bytes) -> None:
+        """Сохранить уже закодированное содержимое в файл в папке текущего ревью."""
         file_path = self.artifacts_dir / filename
-        file_path.write_text(content, encoding="utf-8")
+        file_path.write_bytes(data)
 
     async def get_branch_diff(self) -> BranchDiffResult:
         """
@@ -185,7 +238,7 @@ class Pipeline:
         Returns:
             список FileEntities для каждого файла
         """
-        result = self.entity_service.extract_entities(files)
+        result = await self.entity_service.extract_entities(files)
         return result
 
     async def analyze_impact(self, entities_result: list) -> dict:
@@ -219,18 +272,21 @@ class Pipeline:
             список ответов от LLM
         """
 
+        total_prompts = len(prompts)
+
         async def process_prompt(i: int, prompt: str) -> tuple[int, str]:
             review, usage = await self.llm_service.send(prompt)
 
             # Сохраняем каждый ревью
-            self._save_file(f"{i}.review.md", review)
+            await asyncio.to_thread(self._save_bytes, f"{i}.review.md", review.encode())
             logger.info(
-                f"[6/7] Pack {i}/{len(prompts)}: ✓ {usage['total_tokens']:,} tokens"
+                f"[6/7] Pack {i}/{total_prompts}: ✓ {usage['total_tokens']:,} tokens"
             )
 
             return i, review
 
-        # Запускаем все промпты параллельно
+        # Запускаем промпты параллельно (LLMService пропускает не больше
+        # llm_max_concurrency запросов одновременно)
         tasks = [process_prompt(i, prompt) for i, prompt in enumerate(prompts, 1)]
         results = await asyncio.gather(*tasks)
 
@@ -249,44 +305,50 @@ class Pipeline:
         """
         batch_size = self.config.finalize_batch_size
 
-        async def finalize_batch(batch_num: int, batch: list[str]) -> tuple[int, str]:
-            # Объединяем ревью из батча
-            joined = "\n\n---\n\n".join(
-                f"# Review Pack {start_idx + i + 1}\n\n{review}"
-                for i, review in enumerate(batch)
+        # Разбиваем на батчи и объединяем ревью каждого батча в промпт
+        summary_prompts = [
+            SUMMARY_PROMPT.format(
+                reviews="\n\n---\n\n".join(
+                    f"# Review Pack {start + i + 1}\n\n{review}"
+                    for i, review in enumerate(reviews[start : start + batch_size])
+                )
             )
+            for start in range(0, len(reviews), batch_size)
+        ]
+        total_batches = len(summary_prompts)
 
-            summary_prompt = SUMMARY_PROMPT.format(reviews=joined)
-            summary, usage = await self.llm_service.send(summary_prompt)
-
-            # Сохраняем каждое батч-саммари
-            self._save_file(f"{batch_num}.finalized.json", summary)
+        # Параллельная финализация батчей
+        results = await self.llm_service.send_many(summary_prompts)
+        finalized_reviews = [summary for summary, _ in results]
+
+        # Сохраняем каждое батч-саммари
+        await asyncio.gather(
+            *[
+                asyncio.to_thread(
+                    self._save_bytes, f"{batch_num}.finalized.json", summary.encode()
+                )
+                for batch_num, summary in enumerate(finalized_reviews, 1)
+            ]
+        )
+        for batch_num, (_, usage) in enumerate(results, 1):
             logger.info(
                 f"[7/7] Finalize batch {batch_num}/{total_batches}: ✓ {usage['total_tokens']:,} tokens"
             )
 
-            return batch_num, summary
-
-        # Разбиваем на батчи
-        batches = [
-            reviews[i : i + batch_size] for i in range(0, len(reviews), batch_size)
-        ]
-        total_batches = len(batches)
-
-        # Параллельная финализация батчей
-        tasks = []
-        for batch_num, batch in enumerate(batches, 1):
-            start_idx = (batch_num - 1) * batch_size
-            tasks.append(finalize_batch(batch_num, batch))
-
-        results = await asyncio.gather(*tasks)
-        finalized_reviews = [summary for _, summary in sorted(results)]
+        # Парсим JSON из всех батчей в потоках и объединяем комментарии
+        parsed = await asyncio.gather(
+            *[
+                asyncio.to_thread(self._parse_json_response, summary)
+                for summary in finalized_reviews
+            ],
+            return_exceptions=True,
+        )
 
-        # Парсим JSON из всех батчей и объединяем комментарии
         all_comments = []
-        for summary in finalized_reviews:
+        for data in parsed:
             try:
-                data = self._parse_json_response(summary)
+                if isinstance(data, BaseException):
+                    raise data
                 all_comments.extend(data.get("comments", []))
             except Exception as e:
                 logger.warning(f"Could not parse JSON from batch: {e}")
@@ -298,11 +360,12 @@ class Pipeline:
         clean_response = response.strip()
 
         # Убираем markdown code blocks если есть
-        if clean_response.startswith("```"):
-            lines = clean_response.split("\n")
-            clean_response = "\n".join(lines[1:-1])
+        match = _FENCE_RE.match(clean_response)
+        if match:
+            end = clean_response.rfind("```", match.end())
+            clean_response = clean_response[match.end() : end if end != -1 else None]
 
-        return json.loads(clean_response)
+        return orjson.loads(clean_response)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,23 @@
+"""Общий кэш tree-sitter парсеров."""
+
+import threading
+from typing import cast
+
+from tree_sitter import Parser
+from tree_sitter_language_pack import get_parser as _load_parser, SupportedLanguage
+
+# Parser не потокобезопасен, поэтому у каждого потока свои парсеры
+_local = threading.local()
+
+
+def get_parser(lang: str) -> Parser:
+    """Получить parser для языка (один на поток)."""
+    parsers: dict[str, Parser] | None = getattr(_local, "parsers", None)
+    if parsers is None:
+        parsers = _local.parsers = {}
+
+    parser = parsers.get(lang)
+    if parser is None:
+        parser = parsers[lang] = _load_parser(cast(SupportedLanguage, lang))
+
+    return parser
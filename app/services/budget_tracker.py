@@ -17,6 +17,10 @@ class BudgetTracker:
         self.input_price = input_price_per_million
         self.output_price = output_price_per_million
 
+        # Цена одного токена, чтобы не делить на миллион при каждом расчёте
+        self._input_rate = input_price_per_million / 1_000_000
+        self._output_rate = output_price_per_million / 1_000_000
+
     def add_usage(self, prompt_tokens: int, completion_tokens: int) -> None:
         """
         Добавить использование токенов из одного вызова LLM.
@@ -36,9 +40,9 @@ class BudgetTracker:
             Общая стоимость в USD
         """
         return (
-            self.input_tokens * self.input_price
-            + self.output_tokens * self.output_price
-        ) / 1_000_000
+            self.input_tokens * self._input_rate
+            + self.output_tokens * self._output_rate
+        )
 
     def get_summary(self) -> dict:
         """
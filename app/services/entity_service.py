@@ -1,18 +1,24 @@
 """Сервис извлечения сущностей из диффов."""
 
+import asyncio
 import logging
+from bisect import bisect_right
 from dataclasses import dataclass
 from pathlib import Path
 
-from tree_sitter_language_pack import get_parser
-
-from app.constants import LANGUAGE_MAP
 from app.services.git_service import FileDiff
+from app.services.parsed_file_provider import ParsedFileProvider
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+def _overlaps(intervals: list[tuple[int, int]], start: int, end: int) -> bool:
+    """Проверить пересечение отрезка [start, end] с отсортированными интервалами."""
+    i = bisect_right(intervals, end, key=lambda interval: interval[0]) - 1
+    return i >= 0 and intervals[i][1] >= start
+
+
+@dataclass(slots=True)
 class LocalCodeBlock:
     """Блок локального кода с номерами строк."""
 
@@ -21,7 +27,7 @@ class LocalCodeBlock:
     end_line: int
 
 
-@dataclass
+@dataclass(slots=True)
 class FileEntities:
     """Сущности найденные в файле."""
 
@@ -33,66 +39,59 @@ class FileEntities:
 class EntityService:
     """Сервис для поиска затронутых сущностей в коде."""
 
-    def __init__(self, repo_path: str):
+    def __init__(self, repo_path: str, provider: ParsedFileProvider | None = None):
         self.repo_path = Path(repo_path)
-        self.parsers = {}
-
-    def _get_parser(self, file_path: str):
-        """Получить parser для файла по расширению."""
-        ext = file_path.rsplit(".", 1)[-1] if "." in file_path else ""
-        lang = LANGUAGE_MAP.get(ext)
-
-        if not lang:
-            return None
-
-        if lang not in self.parsers:
-            self.parsers[lang] = get_parser(lang)  # type: ignore
-
-        return self.parsers[lang]
+        self.provider = (
+            provider if provider is not None else ParsedFileProvider(repo_path)
+        )
 
-    def extract_entities(self, files: list[FileDiff]) -> list[FileEntities]:
+    async def extract_entities(self, files: list[FileDiff]) -> list[FileEntities]:
         """
         Извлечь сущности из списка файлов.
 
+        Файлы обрабатываются параллельно в потоках: чтение файла и парсинг
+        tree-sitter не держат GIL.
+
         Args:
             files: список файлов с диффами
 
         Returns:
             список FileEntities для каждого обработанного файла
         """
+        extracted = await asyncio.gather(
+            *[asyncio.to_thread(self._extract_from_file, file) for file in files],
+            return_exceptions=True,
+        )
+
         results = []
 
-        for file in files:
-            try:
-                entities = self._extract_from_file(file)
-                if entities:
-                    results.append(entities)
-            except Exception as e:
-                logger.warning(f"Failed to extract entities from {file.path}: {e}")
+        for file, entities in zip(files, extracted):
+            if isinstance(entities, BaseException):
+                logger.warning(
+                    f"Failed to extract entities from {file.path}: {entities}"
+                )
+            elif entities:
+                results.append(entities)
 
         return results
 
     def _extract_from_file(self, file: FileDiff) -> FileEntities | None:
         """Извлечь сущности из одного файла."""
-        parser = self._get_parser(file.path)
-        if not parser:
-            return None
-
-        # Читаем файл
-        code = self._read_file(file.path)
-        if code is None:
+        # Изменённые строки уже посчитаны GitService при разборе diff
+        changed_lines = file.hunks
+        if not changed_lines:
             return None
 
-        # Парсим diff для получения изменённых строк
-        changed_lines = self._parse_changed_lines(file.diff)
-        if not changed_lines:
+        # Читаем и парсим код (дерево переиспользуется импакт-анализом)
+        parsed = self.provider.get_parsed(file.path)
+        if parsed is None:
             return None
 
-        # Парсим код
-        root = parser.parse(code).root_node
+        code, tree, _ = parsed
+        root = tree.root_node
 
         # Ищем затронутые сущности
-        top_level = []
+        top_level: dict[str, None] = {}  # упорядоченное множество имён
         local_code = []
 
         for child in root.children:
@@ -111,42 +110,15 @@ class EntityService:
                 )
 
         return FileEntities(
-            path=file.path, top_level=list(set(top_level)), local_code=local_code
+            path=file.path, top_level=list(top_level), local_code=local_code
         )
 
-    def _read_file(self, relative_path: str) -> bytes | None:
-        """Прочитать содержимое файла."""
-        try:
-            full_path = self.repo_path / relative_path
-            return full_path.read_bytes()
-        except (OSError, IOError):
-            return None
-
-    def _parse_changed_lines(self, diff: str) -> set[int]:
-        """Извлечь номера изменённых строк из diff."""
-        changed_lines = set()
-
-        for line in diff.split("\n"):
-            if line.startswith("@@"):
-                # @@ -1,2 +3,4 @@
-                try:
-                    part = line.split("+")[1].split(" ")[0]
-                    if "," in part:
-                        start, count = map(int, part.split(","))
-                        changed_lines.update(range(start, start + count))
-                    else:
-                        changed_lines.add(int(part))
-                except Exception:
-                    continue
-
-        return changed_lines
-
     def _check_and_add_node(
         self,
         node,
         code: bytes,
-        changed_lines: set[int],
-        top_level: list[str],
+        changed_lines: list[tuple[int, int]],
+        top_level: dict[str, None],
         local_code: list[LocalCodeBlock],
         is_exported: bool,
     ):
@@ -155,11 +127,11 @@ class EntityService:
         end_line = node.end_point[0] + 1
 
         # Проверяем пересечение с изменёнными строками
-        if not any(l in changed_lines for l in range(start_line, end_line + 1)):
+        if not _overlaps(changed_lines, start_line, end_line):
             return
 
         # Извлекаем код узла
-        snippet = code[node.start_byte : node.end_byte].decode()
+        snippet = code[node.start_byte : node.end_byte].decode(errors="replace")
         local_code.append(
             LocalCodeBlock(code=snippet, start_line=start_line, end_line=end_line)
         )
@@ -170,7 +142,7 @@ class EntityService:
                 for child in node.children:
                     name_node = child.child_by_field_name("name")
                     if name_node:
-                        top_level.append(name_node.text.decode())
+                        top_level[name_node.text.decode()] = None
                         break
 
                     if child.type in ("lexical_declaration", "variable_declaration"):
@@ -178,8 +150,8 @@ class EntityService:
                             if c.type == "variable_declarator":
                                 name = c.child_by_field_name("name")
                                 if name:
-                                    top_level.append(name.text.decode())
+                                    top_level[name.text.decode()] = None
             else:
                 name_node = node.child_by_field_name("name")
                 if name_node:
-                    top_level.append(name_node.text.decode())
+                    top_level[name_node.text.decode()] = None
@@ -1,23 +1,101 @@
 """Git-сервис для операций с диффом веток."""
 
+import codecs
 import logging
+import re
 from pathlib import Path
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, field
 from git import Repo
 
 logger = logging.getLogger(__name__)
 
+# Граница между файлами в общем патче `git diff`
+_FILE_HEADER_RE = re.compile(r"^(?=diff --git )", re.M)
 
-@dataclass
+# Заголовок ханка unified diff: @@ -1,2 +3,4 @@
+_HUNK_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@", re.M)
+
+
+# Строки расширенного заголовка патча с путём файла, в порядке приоритета
+_PATH_HEADER_PREFIXES = ("rename to ", "copy to ", "+++ ", "--- ")
+
+
+def _unquote_path(path: str) -> str:
+    """Снять C-кавычки, которыми git оборачивает пути со спецсимволами."""
+    if len(path) < 2 or not (path.startswith('"') and path.endswith('"')):
+        return path
+    return codecs.escape_decode(path[1:-1].encode())[0].decode(errors="replace")
+
+
+def _patch_chunk_path(chunk: str) -> str:
+    """
+    Определить путь файла по заголовку куска патча `diff --git`.
+
+    Берём новый путь (rename/copy to, +++ b/), для удалённых файлов - старый
+    (--- a/). Если ---/+++ нет (бинарные файлы, смена режима) - путь из
+    первой строки `diff --git a/P b/P`.
+    """
+    header, _, rest = chunk.partition("\n")
+    meta_lines = rest.split("\n@@", 1)[0].split("\n")
+
+    for prefix in _PATH_HEADER_PREFIXES:
+        for line in meta_lines:
+            if not line.startswith(prefix):
+                continue
+
+            # Для путей с пробелами git дописывает табуляцию в строки ---/+++
+            path = _unquote_path(line[len(prefix) :].rstrip("\t"))
+            if prefix in ("+++ ", "--- "):
+                if path == "/dev/null":
+                    continue
+                path = path[2:]  # префикс a/ или b/
+            return path
+
+    # diff --git a/P b/P: без переименования оба пути совпадают
+    paths = header[len("diff --git ") :]
+    if paths.startswith('"'):
+        return _unquote_path(paths[: paths.index('" ') + 1])[2:]
+    return paths[2 : 2 + (len(paths) - 5) // 2]
+
+
+def parse_hunks(diff: str) -> list[tuple[int, int]]:
+    """
+    Извлечь изменённые строки новой версии файла из diff.
+
+    Returns:
+        отсортированный список непересекающихся интервалов (start, end) включительно
+    """
+    hunks: list[tuple[int, int]] = []
+
+    for match in _HUNK_RE.finditer(diff):
+        start = int(match.group(1))
+        count = int(match.group(2) or 1)
+        if count == 0:
+            continue
+
+        end = start + count - 1
+        if hunks and start <= hunks[-1][1] + 1:
+            # Ханк пересекается или примыкает к предыдущему - объединяем
+            prev_start, prev_end = hunks[-1]
+            hunks[-1] = (prev_start, max(prev_end, end))
+        else:
+            hunks.append((start, end))
+
+    return hunks
+
+
+@dataclass(slots=True)
 class FileDiff:
     """Представляет файл с его diff."""
 
     path: str
     diff: str
     status: str  # A, M, D, R
+    # изменённые строки (start, end) включительно, считаются один раз в GitService
+    hunks: list[tuple[int, int]] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(slots=True)
 class BranchDiffResult:
     """Результат сравнения ветки с main."""
 
@@ -26,9 +104,21 @@ class BranchDiffResult:
     head_commit: str  # последний коммит в ветке
     files: list[FileDiff]
 
+    @property
+    def hunks(self) -> dict[str, list[tuple[int, int]]]:
+        """Изменённые строки всех файлов по пути файла."""
+        return {f.path: f.hunks for f in self.files}
+
     def to_dict(self) -> dict:
         """Преобразовать в словарь для JSON сериализации."""
-        return asdict(self)
+        return {
+            "branch_name": self.branch_name,
+            "base_commit": self.base_commit,
+            "head_commit": self.head_commit,
+            "files": [
+                {"path": f.path, "diff": f.diff, "status": f.status} for f in self.files
+            ],
+        }
 
 
 class GitService:
@@ -74,30 +164,46 @@ class GitService:
         logger.info(f"Merge base: {merge_base_commit.hexsha}")
         logger.info(f"Head commit: {head_commit.hexsha}")
 
-        # Получаем список измененных файлов и их диффы через git напрямую
-        diff_output = self.repo.git.diff(
-            f"{merge_base_commit.hexsha}..{head_commit.hexsha}", "--name-status"
-        )
+        commit_range = f"{merge_base_commit.hexsha}..{head_commit.hexsha}"
+
+        # Получаем список измененных файлов и их статусы (-z: пути без кавычек)
+        name_status = self.repo.git.diff(commit_range, "--name-status", "-z")
+
+        # Получаем патч всех файлов одним вызовом git вместо вызова на каждый файл.
+        # Куски сопоставляются с файлами по пути из заголовка, а не по порядку:
+        # у одного файла может быть несколько кусков (например, при смене типа T
+        # файл -> симлинк git выводит удаление и добавление отдельно)
+        # Префиксы a/ и b/ задаём явно: diff.noprefix или diff.mnemonicPrefix
+        # в конфиге пользователя меняют их, и пути в заголовках не распознаются
+        patch = self.repo.git.diff(commit_range, "--src-prefix=a/", "--dst-prefix=b/")
+        diffs_by_path: dict[str, list[str]] = {}
+        for chunk in _FILE_HEADER_RE.split(patch):
+            if chunk:
+                diffs_by_path.setdefault(_patch_chunk_path(chunk), []).append(
+                    chunk.rstrip("\n")
+                )
 
         files = []
-        for line in diff_output.strip().split("\n"):
-            if not line:
-                continue
-
-            parts = line.split("\t")
-            if len(parts) < 2:
-                continue
-
-            status = parts[0][0]  # A, M, D, R, etc
-            file_path = parts[-1]  # последний элемент - всегда путь файла
-
-            # Получаем diff для файла
-            file_diff = self.repo.git.diff(
-                f"{merge_base_commit.hexsha}..{head_commit.hexsha}", "--", file_path
+        tokens = name_status.split("\0")
+        i = 0
+        while i < len(tokens) and tokens[i]:
+            status = tokens[i][0]  # A, M, D, R, C, T, etc
+            # У переименования и копирования два пути: старый и новый
+            path_count = 2 if status in ("R", "C") else 1
+            file_path = tokens[i + path_count]  # последний путь - всегда путь файла
+            i += path_count + 1
+
+            file_diff = "\n".join(diffs_by_path.get(file_path, []))
+
+            files.append(
+                FileDiff(
+                    path=file_path,
+                    diff=file_diff,
+                    status=status,
+                    hunks=parse_hunks(file_diff),
+                )
             )
 
-            files.append(FileDiff(path=file_path, diff=file_diff, status=status))
-
         return BranchDiffResult(
             branch_name=branch,
             base_commit=merge_base_commit.hexsha,
@@ -1,15 +1,77 @@
 """Парсинг AST для извлечения функций и зависимостей."""
 
 import logging
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import cast
-from tree_sitter_language_pack import get_parser, SupportedLanguage
 
-from app.constants import LANGUAGE_MAP
-from .models import FunctionInfo, DependencyInfo, ParsedFile
+from tree_sitter import Node, Query, QueryCursor, Tree
+from tree_sitter_language_pack import get_language, SupportedLanguage
+
+from .models import DependencyInfo, ParsedFile
 from .config import ImpactConfig
 
 logger = logging.getLogger(__name__)
 
+# Функции, классы, методы и переменные с функцией в значении.
+# Тип значения переменной проверяется в Python: набор типов зависит от грамматики.
+FUNCTIONS_QUERY = """
+(function_declaration name: (_) @name) @function
+(class_declaration name: (_) @name) @function
+(method_definition name: (_) @name) @function
+(variable_declarator name: (_) @name value: (_) @value) @function
+"""
+
+# Вызовы функций и методов
+CALLS_QUERY = """
+(call_expression function: (identifier) @call)
+(call_expression function: (member_expression property: (_) @call))
+"""
+
+# Использование JSX-компонентов (только для грамматик с JSX)
+JSX_CALLS_QUERY = """
+(jsx_opening_element . (identifier) @call)
+(jsx_self_closing_element . (identifier) @call)
+"""
+
+# Импорты
+DEPENDENCIES_QUERY = """
+(import_statement source: (_) @source)
+"""
+
+# Типы значений переменной, при которых она считается функцией
+FUNCTION_VALUE_TYPES = frozenset({"arrow_function", "function_expression", "function"})
+
+
+@dataclass(frozen=True)
+class _LanguageQueries:
+    """Скомпилированные запросы tree-sitter для языка."""
+
+    functions: Query
+    calls: Query
+    dependencies: Query
+
+
+def _node_text(node: Node) -> str:
+    """Текст узла (дерево разобрано из bytes, поэтому text всегда заполнен)."""
+    return cast(bytes, node.text).decode()
+
+
+@lru_cache(maxsize=None)
+def _get_queries(lang: str) -> _LanguageQueries:
+    """Скомпилировать запросы для языка (один раз на процесс)."""
+    language = get_language(cast(SupportedLanguage, lang))
+
+    calls_query = CALLS_QUERY
+    if language.id_for_node_kind("jsx_opening_element", True) is not None:
+        calls_query += JSX_CALLS_QUERY
+
+    return _LanguageQueries(
+        functions=Query(language, FUNCTIONS_QUERY),
+        calls=Query(language, calls_query),
+        dependencies=Query(language, DEPENDENCIES_QUERY),
+    )
+
 
 class ASTParser:
     """Парсер для извлечения функций и зависимостей из AST."""
@@ -17,149 +79,70 @@ class ASTParser:
     def __init__(self, config: ImpactConfig):
         self.config = config
 
-    def parse_file(self, content: str, filename: str) -> ParsedFile:
+    def parse_file(self, tree: Tree, lang: str) -> ParsedFile:
         """
-        Парсинг файла для извлечения функций и зависимостей.
+        Извлечь функции и зависимости из уже распарсенного файла.
+
+        Args:
+            tree: дерево разбора tree-sitter
+            lang: язык tree-sitter
 
         Returns:
             ParsedFile с функциями и зависимостями
         """
-        lang = self._detect_language(filename)
-        if not lang:
-            return ParsedFile(functions=[], dependencies=[])
-
-        parser = get_parser(cast(SupportedLanguage, lang))
-        tree = parser.parse(bytes(content, "utf8"))
-
-        return ParsedFile(
-            functions=self._extract_functions(tree.root_node),
-            dependencies=self._extract_dependencies(tree.root_node),
+        parsed = ParsedFile(
+            dependencies=self._extract_dependencies(tree.root_node, lang)
+        )
+        self._extract_functions(tree.root_node, lang, parsed)
+        return parsed
+
+    def _extract_functions(self, node: Node, lang: str, parsed: ParsedFile) -> None:
+        """Извлечь функции из AST в столбцы parsed."""
+        queries = _get_queries(lang)
+        matches = QueryCursor(queries.functions).matches(node)
+
+        # Сохраняем порядок обхода дерева: родитель раньше вложенных узлов
+        matches.sort(
+            key=lambda m: (
+                m[1]["function"][0].start_byte,
+                -m[1]["function"][0].end_byte,
+            )
         )
 
-    def _detect_language(self, filename: str):
-        """Определить язык по расширению файла."""
-        for ext, lang in LANGUAGE_MAP.items():
-            if filename.endswith(f".{ext}"):
-                return lang
-        return None
-
-    def _extract_functions(self, node) -> list[FunctionInfo]:
-        """Извлечь функции из AST."""
-        functions = []
-
-        def visit(n):
-            if n.type == "function_declaration":
-                name_node = n.child_by_field_name("name")
-                if name_node:
-                    functions.append(
-                        FunctionInfo(
-                            name=name_node.text.decode(),
-                            line=n.start_point[0] + 1,
-                            end_line=n.end_point[0] + 1,
-                            code=n.text.decode(),
-                            calls=self._extract_calls(n),
-                        )
-                    )
-
-            elif n.type == "class_declaration":
-                name_node = n.child_by_field_name("name")
-                if name_node:
-                    functions.append(
-                        FunctionInfo(
-                            name=name_node.text.decode(),
-                            line=n.start_point[0] + 1,
-                            end_line=n.end_point[0] + 1,
-                            code=n.text.decode(),
-                            calls=self._extract_calls(n),
-                        )
-                    )
-
-            elif n.type == "method_definition":
-                name_node = n.child_by_field_name("name")
-                if name_node:
-                    functions.append(
-                        FunctionInfo(
-                            name=name_node.text.decode(),
-                            line=n.start_point[0] + 1,
-                            end_line=n.end_point[0] + 1,
-                            code=n.text.decode(),
-                            calls=self._extract_calls(n),
-                        )
-                    )
-
-            elif n.type == "variable_declarator":
-                name_node = n.child_by_field_name("name")
-                value_node = n.child_by_field_name("value")
-
-                if (
-                    name_node
-                    and value_node
-                    and value_node.type
-                    in ["arrow_function", "function_expression", "function"]
-                ):
-                    functions.append(
-                        FunctionInfo(
-                            name=name_node.text.decode(),
-                            line=n.start_point[0] + 1,
-                            end_line=n.end_point[0] + 1,
-                            code=n.text.decode(),
-                            calls=self._extract_calls(value_node),
-                        )
-                    )
-
-            for child in n.children:
-                visit(child)
-
-        visit(node)
-        return functions
-
-    def _extract_calls(self, node) -> list[str]:
+        for _, captures in matches:
+            n = captures["function"][0]
+            name_node = captures["name"][0]
+
+            if "value" in captures:
+                body = captures["value"][0]
+                if body.type not in FUNCTION_VALUE_TYPES:
+                    continue
+            else:
+                body = n
+
+            parsed.add_function(
+                name=_node_text(name_node),
+                line=n.start_point[0] + 1,
+                end_line=n.end_point[0] + 1,
+                code=_node_text(n),
+                calls=self._extract_calls(body, queries.calls),
+            )
+
+    def _extract_calls(self, node: Node, query: Query) -> list[str]:
         """Извлечь вызовы функций из узла."""
-        calls = set()
-
-        def visit(n):
-            if n.type == "call_expression":
-                func = n.child_by_field_name("function")
-                if func:
-                    if func.type == "identifier":
-                        calls.add(func.text.decode())
-                    elif func.type == "member_expression":
-                        prop = func.child_by_field_name("property")
-                        if prop:
-                            calls.add(prop.text.decode())
-
-            elif n.type in ["jsx_element", "jsx_self_closing_element"]:
-                for child in n.children:
-                    if child.type == "jsx_opening_element":
-                        for subchild in child.children:
-                            if subchild.type == "identifier":
-                                calls.add(subchild.text.decode())
-                                break
-                    elif child.type == "identifier":
-                        calls.add(child.text.decode())
-                        break
-
-            for child in n.children:
-                visit(child)
-
-        visit(node)
-        return list(calls)
-
-    def _extract_dependencies(self, node) -> list[DependencyInfo]:
-        """Извлечь импорты из AST."""
-        deps = []
+        captures = QueryCursor(query).captures(node)
+        return list({_node_text(n) for n in captures.get("call", [])})
 
-        def visit(n):
-            if n.type == "import_statement":
-                source = n.child_by_field_name("source")
-                if source:
-                    path = source.text.decode().strip("\"'")
-                    # Считаем алиас "app/" внутренним (не external)
-                    is_external = not (path.startswith(".") or path.startswith("app/"))
-                    deps.append(DependencyInfo(source=path, is_external=is_external))
+    def _extract_dependencies(self, node: Node, lang: str) -> list[DependencyInfo]:
+        """Извлечь импорты из AST."""
+        captures = QueryCursor(_get_queries(lang).dependencies).captures(node)
+        sources = sorted(captures.get("source", []), key=lambda n: n.start_byte)
 
-            for child in n.children:
-                visit(child)
+        deps = []
+        for source in sources:
+            path = _node_text(source).strip("\"'")
+            # Считаем алиас "app/" внутренним (не external)
+            is_external = not (path.startswith(".") or path.startswith("app/"))
+            deps.append(DependencyInfo(source=path, is_external=is_external))
 
-        visit(node)
         return deps
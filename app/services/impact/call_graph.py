@@ -1,8 +1,10 @@
 """Построение графа вызовов."""
 
 import os
+import re
+import sys
 import logging
-from typing import Any
+from collections import defaultdict
 
 from .models import ParsedFile
 from .config import ImpactConfig
@@ -10,13 +12,52 @@ from .config import ImpactConfig
 logger = logging.getLogger(__name__)
 
 
+class _Node:
+    """Узел графа вызовов: функция и её связи."""
+
+    __slots__ = ("name", "file", "line", "end_line", "code", "callers", "callees")
+
+    def __init__(self, name: str, file: str, line: int, end_line: int, code: str):
+        self.name = name
+        self.file = file
+        self.line = line
+        self.end_line = end_line
+        self.code = code
+        self.callers: tuple[str, ...] = ()  # ключи вызывающих функций
+        self.callees: tuple[str, ...] = ()  # ключи вызываемых функций
+
+
 class CallGraph:
     """Граф вызовов функций."""
 
     def __init__(self, repo_path: str, config: ImpactConfig):
         self.repo_path = repo_path
         self.config = config
-        self._graph: dict[str, dict[str, Any]] = {}
+        self._graph: dict[str, _Node] = {}
+
+        # Файл узла по ключу - без разбора строки "file:name"
+        self._node_file: dict[str, str] = {}
+
+        # Кэши резолва импортов: {(import_path, current_dir): file_path}
+        # и содержимое директорий {dir: имена файлов и папок}
+        self._import_cache: dict[tuple[str, str], str] = {}
+        self._dir_entries: dict[str, frozenset[str]] = {}
+
+        # Все алиасы путей одним регулярным выражением: группа a{i} -> i-й алиас
+        aliases = list(config.path_aliases.items())
+        self._alias_targets: dict[str, str] = {
+            f"a{i}": real_path for i, (_, real_path) in enumerate(aliases)
+        }
+        self._alias_re = (
+            re.compile(
+                "|".join(
+                    f"(?P<a{i}>{re.escape(alias)})"
+                    for i, (alias, _) in enumerate(aliases)
+                )
+            )
+            if aliases
+            else None
+        )
 
     def build(self, file_analysis: dict[str, ParsedFile]) -> None:
         """
@@ -35,40 +76,72 @@ class CallGraph:
     def _create_nodes(self, file_analysis: dict[str, ParsedFile]) -> None:
         """Создать узлы графа из функций."""
         for file_path, parsed in file_analysis.items():
-            for func in parsed.functions:
-                key = f"{file_path}:{func.name}"
-                self._graph[key] = {
-                    "name": func.name,
-                    "file": file_path,
-                    "line": func.line,
-                    "end_line": func.end_line,
-                    "code": func.code,
-                    "callers": [],
-                    "callees": [],
-                }
+            # Интернируем строки: ключи в рёбрах ссылаются на один объект
+            file_path = sys.intern(file_path)
+
+            for name, line, end_line, code in zip(
+                parsed.names, parsed.lines, parsed.end_lines, parsed.codes
+            ):
+                key = sys.intern(f"{file_path}:{name}")
+                self._graph[key] = _Node(name, file_path, line, end_line, code)
+                self._node_file[key] = file_path
 
     def _create_edges(self, file_analysis: dict[str, ParsedFile]) -> None:
         """Создать рёбра графа из вызовов функций."""
-        for file_path, parsed in file_analysis.items():
-            for func in parsed.functions:
-                caller_key = f"{file_path}:{func.name}"
+        graph = self._graph
 
-                for call_name in func.calls:
-                    callee_key = self._resolve_callee(
-                        call_name, file_path, parsed.dependencies
-                    )
+        # Сначала резолвим все вызовы в плоский список рёбер (caller, callee)
+        edges: list[tuple[str, str]] = []
 
-                    if callee_key and callee_key in self._graph:
-                        self._graph[caller_key]["callees"].append(callee_key)
-                        self._graph[callee_key]["callers"].append(caller_key)
+        for file_path, parsed in file_analysis.items():
+            calls_names = parsed.calls_names
+            indptr = parsed.calls_indptr
+
+            # Импорты одинаковы для всех функций файла - резолвим их один раз
+            dep_files = list(
+                dict.fromkeys(
+                    self._resolve_import_path(dep.source, file_path)
+                    for dep in parsed.dependencies
+                    if not dep.is_external
+                )
+            )
+
+            for i, name in enumerate(parsed.names):
+                caller_key = sys.intern(f"{file_path}:{name}")
+
+                for call_name in calls_names[indptr[i] : indptr[i + 1]]:
+                    callee_key = self._resolve_callee(call_name, file_path, dep_files)
+
+                    if callee_key:
+                        edges.append((caller_key, sys.intern(callee_key)))
+
+        # Затем собираем смежность одним проходом. Упорядоченные множества
+        # (dict) убирают повторные рёбра с сохранением порядка появления
+        callees: dict[str, dict[str, None]] = defaultdict(dict)
+        callers: dict[str, dict[str, None]] = defaultdict(dict)
+
+        for caller_key, callee_key in edges:
+            callees[caller_key][callee_key] = None
+            callers[callee_key][caller_key] = None
+
+        # Для обхода нужны только чтение и итерация - храним кортежи
+        for key, keys in callees.items():
+            graph[key].callees = tuple(keys)
+        for key, keys in callers.items():
+            graph[key].callers = tuple(keys)
 
     def _resolve_callee(
-        self, call_name: str, current_file: str, dependencies: list
+        self, call_name: str, current_file: str, dep_files: list[str]
     ) -> str | None:
         """
         Резолвить вызов в ключ графа.
 
-        Сначала ищем в том же файле, потом в импортах.
+        Сначала ищем в том же файле, потом в файлах импортов.
+
+        Args:
+            call_name: имя вызываемой функции
+            current_file: файл, в котором сделан вызов
+            dep_files: пути внутренних импортов файла (уже резолвленные)
         """
         # Пробуем в том же файле
         callee_key = f"{current_file}:{call_name}"
@@ -76,27 +149,37 @@ class CallGraph:
             return callee_key
 
         # Ищем в импортах
-        for dep in dependencies:
-            if not dep.is_external:
-                dep_file = self._resolve_import_path(dep.source, current_file)
-                callee_key = f"{dep_file}:{call_name}"
-
-                if callee_key in self._graph:
-                    return callee_key
+        for dep_file in dep_files:
+            callee_key = f"{dep_file}:{call_name}"
+            if callee_key in self._graph:
+                return callee_key
 
         return None
 
     def _resolve_import_path(self, import_path: str, current_file: str) -> str:
-        """Резолвить путь импорта в путь к файлу."""
-        # Обработка алиасов
-        for alias, real_path in self.config.path_aliases.items():
-            if import_path.startswith(alias):
-                resolved = import_path.replace(alias, real_path, 1)
-                return self._try_extensions(resolved)
+        """Резолвить путь импорта в путь к файлу (с кэшем по директории файла)."""
+        current_dir = os.path.dirname(current_file)
+        cache_key = (import_path, current_dir)
+
+        resolved = self._import_cache.get(cache_key)
+        if resolved is None:
+            resolved = self._import_cache[cache_key] = self._resolve_uncached(
+                import_path, current_dir
+            )
+
+        return resolved
+
+    def _resolve_uncached(self, import_path: str, current_dir: str) -> str:
+        """Резолвить путь импорта без кэша."""
+        # Обработка алиасов (при нескольких совпадениях - первый по порядку)
+        match = self._alias_re.match(import_path) if self._alias_re else None
+        if match and match.lastgroup is not None:
+            real_path = self._alias_targets[match.lastgroup]
+            resolved = real_path + import_path[match.end() :]
+            return self._try_extensions(resolved)
 
         # Обработка относительных путей
         if import_path.startswith("."):
-            current_dir = os.path.dirname(current_file)
             resolved = os.path.normpath(os.path.join(current_dir, import_path))
             return self._try_extensions(resolved)
 
@@ -106,15 +189,33 @@ class CallGraph:
     def _try_extensions(self, base_path: str) -> str:
         """Попробовать разные расширения для пути."""
         for suffix in self.config.import_resolution_suffixes:
-            full_path = os.path.join(self.repo_path, base_path + suffix)
-            if os.path.exists(full_path):
+            parent, name = os.path.split(base_path + suffix)
+            if name in self._list_dir(parent):
                 return base_path + suffix
         return base_path
 
-    def get_node(self, key: str) -> dict[str, Any] | None:
+    def _list_dir(self, rel_dir: str) -> frozenset[str]:
+        """Имена в директории репозитория (один scandir на директорию)."""
+        entries = self._dir_entries.get(rel_dir)
+        if entries is None:
+            try:
+                with os.scandir(os.path.join(self.repo_path, rel_dir)) as it:
+                    entries = frozenset(entry.name for entry in it)
+            except OSError:
+                entries = frozenset()
+            self._dir_entries[rel_dir] = entries
+
+        return entries
+
+    def get_node(self, key: str) -> _Node | None:
         """Получить узел графа по ключу."""
         return self._graph.get(key)
 
+    @property
+    def node_file(self) -> dict[str, str]:
+        """Словарь {ключ узла: путь к файлу узла}."""
+        return self._node_file
+
     def has_node(self, key: str) -> bool:
         """Проверить наличие узла в графе."""
         return key in self._graph
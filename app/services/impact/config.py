@@ -12,6 +12,11 @@ class ImpactConfig:
     # Расширения файлов для анализа
     file_extensions: tuple[str, ...] = tuple(f".{ext}" for ext in LANGUAGE_MAP.keys())
 
+    # Директории, которые пропускаются без проверки .gitignore
+    excluded_dirs: frozenset[str] = frozenset(
+        {".git", "node_modules", "__pycache__", ".venv", "dist", "build"}
+    )
+
     # Максимальная глубина поиска вызывающих
     max_depth: int = 5
 
@@ -4,11 +4,15 @@ import os
 import logging
 from pathlib import Path
 import pathspec
+from git import Git, GitCommandError
 
 from .config import ImpactConfig
 
 logger = logging.getLogger(__name__)
 
+# Скомпилированные .gitignore между экземплярами: {путь: (mtime_ns, spec)}
+_SPEC_CACHE: dict[str, tuple[int, pathspec.PathSpec]] = {}
+
 
 class FileScanner:
     """Сканирование файлов проекта с учётом .gitignore."""
@@ -16,16 +20,27 @@ class FileScanner:
     def __init__(self, repo_path: str, config: ImpactConfig):
         self.repo_path = repo_path
         self.config = config
+        self._extensions = frozenset(config.file_extensions)
         self._gitignore_spec = self._load_gitignore()
+        self._match = self._gitignore_spec.match_file if self._gitignore_spec else None
 
     def _load_gitignore(self) -> pathspec.PathSpec | None:
-        """Загрузить .gitignore."""
-        gitignore_path = Path(self.repo_path) / ".gitignore"
-        if not gitignore_path.exists():
+        """Загрузить .gitignore (повторно парсится только после изменения файла)."""
+        gitignore_path = os.path.join(self.repo_path, ".gitignore")
+        try:
+            mtime = os.stat(gitignore_path).st_mtime_ns
+        except OSError:
             return None
 
+        cached = _SPEC_CACHE.get(gitignore_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
         with open(gitignore_path) as f:
-            return pathspec.PathSpec.from_lines("gitwildmatch", f)
+            spec = pathspec.PathSpec.from_lines("gitwildmatch", f)
+
+        _SPEC_CACHE[gitignore_path] = (mtime, spec)
+        return spec
 
     def scan(self) -> list[str]:
         """
@@ -35,50 +50,120 @@ class FileScanner:
             Список относительных путей к файлам
         """
         logger.info("[Scanner] Scanning files...")
+
+        files = None
+        if (Path(self.repo_path) / ".git").exists():
+            files = self._list_git_files()
+        if files is None:
+            files = self._walk()
+
+        logger.info(f"[Scanner] Found {len(files)} files")
+        return files
+
+    def _list_git_files(self) -> list[str] | None:
+        """
+        Получить файлы проекта через `git ls-files`.
+
+        Git сам применяет все .gitignore (включая вложенные и глобальный),
+        поэтому pathspec здесь не нужен.
+
+        Returns:
+            Список относительных путей или None, если git недоступен
+        """
+        try:
+            output = Git(self.repo_path).ls_files(
+                "--cached", "--others", "--exclude-standard", "-z"
+            )
+        except (GitCommandError, OSError) as e:
+            logger.debug(f"[Scanner] git ls-files failed, walking directories: {e}")
+            return None
+
+        excluded = self.config.excluded_dirs
         files = []
 
-        for root, dirs, filenames in os.walk(self.repo_path):
-            rel_root = os.path.relpath(root, self.repo_path)
+        for path in output.split("\0"):
+            if os.path.splitext(path)[1] not in self._extensions:
+                continue
+
+            # Исключённые директории пропускаем, как и при обходе
+            *dirs, _ = path.split("/")
+            if excluded.intersection(dirs):
+                continue
 
-            # Фильтруем директории
-            dirs[:] = self._filter_directories(dirs, rel_root)
+            files.append(path.replace("/", os.sep))
 
-            # Собираем подходящие файлы
-            for filename in filenames:
-                if self._should_include_file(filename, rel_root):
-                    rel_path = os.path.relpath(
-                        os.path.join(root, filename), self.repo_path
+        return files
+
+    def _walk(self) -> list[str]:
+        """Обойти директории проекта, фильтруя их по .gitignore."""
+        files = []
+
+        # Явный стек вместо os.walk: относительные пути собираются по ходу
+        # обхода, а тип записи берётся из DirEntry без лишних stat.
+        # Элементы стека: (абсолютный путь, относительный путь, путь для gitignore)
+        stack = [(str(self.repo_path), "", "")]
+
+        while stack:
+            root, rel_root, rel = stack.pop()
+
+            try:
+                with os.scandir(root) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+
+            dirs = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+
+                if is_dir:
+                    # Как os.walk: в символические ссылки на директории не спускаемся
+                    if not entry.is_symlink():
+                        dirs.append(entry.name)
+                elif self._should_include_file(entry.name, rel):
+                    files.append(os.path.join(rel_root, entry.name))
+
+            # Фильтруем директории: в отброшенные не спускаемся.
+            # Кладём в обратном порядке, чтобы обход шёл в порядке os.walk
+            for d in reversed(self._filter_directories(dirs, rel)):
+                stack.append(
+                    (
+                        os.path.join(root, d),
+                        os.path.join(rel_root, d),
+                        f"{rel}/{d}" if rel else d,
                     )
-                    files.append(rel_path)
+                )
 
-        logger.info(f"[Scanner] Found {len(files)} files")
         return files
 
-    def _filter_directories(self, dirs: list[str], rel_root: str) -> list[str]:
-        """Фильтровать директории по .gitignore."""
-        # Всегда исключаем .git (служебная папка)
-        filtered = [d for d in dirs if d != ".git"]
+    def _filter_directories(self, dirs: list[str], rel: str) -> list[str]:
+        """Фильтровать директории по списку исключений и .gitignore."""
+        # Служебные и заведомо сгенерированные папки отбрасываем без pathspec
+        excluded = self.config.excluded_dirs
+        filtered = [d for d in dirs if d not in excluded]
 
-        # Остальное фильтруем по .gitignore
-        if self._gitignore_spec:
-            filtered = [
-                d
-                for d in filtered
-                if not self._gitignore_spec.match_file(f"{rel_root}/{d}/")
-            ]
+        # Остальное фильтруем по .gitignore. Слеш в конце обязателен:
+        # без него pathspec не применяет к пути шаблоны директорий (`dir/`)
+        match = self._match
+        if match:
+            prefix = f"{rel}/" if rel else ""
+            filtered = [d for d in filtered if not match(f"{prefix}{d}/")]
 
         return filtered
 
-    def _should_include_file(self, filename: str, rel_root: str) -> bool:
+    def _should_include_file(self, filename: str, rel: str) -> bool:
         """Проверить, нужно ли включать файл в анализ."""
-        # Проверка расширения
-        if not filename.endswith(self.config.file_extensions):
+        # Проверка расширения - один поиск в множестве; большинство файлов
+        # отсеивается здесь, до дорогой проверки .gitignore
+        if os.path.splitext(filename)[1] not in self._extensions:
             return False
 
         # Проверка .gitignore
-        if self._gitignore_spec:
-            rel_path = os.path.join(rel_root, filename)
-            if self._gitignore_spec.match_file(rel_path):
+        if self._match:
+            if self._match(f"{rel}/{filename}" if rel else filename):
                 return False
 
         return True
@@ -1,7 +1,6 @@
 """Анализ импакта для сущностей."""
 
 import logging
-from collections import deque
 
 from .models import EntityImpact, CallerInfo
 from .call_graph import CallGraph
@@ -46,36 +45,51 @@ class ImpactAnalyzer:
 
     def _find_callers(self, start_key: str) -> tuple[list[str], set[str], set[str]]:
         """
-        Найти всех вызывающих через BFS.
+        Найти всех вызывающих через BFS по уровням.
 
         Returns:
             (direct_callers, all_callers, affected_files)
         """
-        visited = set()
-        queue = deque([(start_key, 0)])
-        direct = []
-        all_callers = set()
-        files = set()
+        node_file = self.call_graph.node_file
+        get_node = self.call_graph.get_node
 
-        while queue:
-            key, depth = queue.popleft()
+        start = get_node(start_key)
+        if not start:
+            return [], set(), set()
 
-            if key in visited or depth > self.config.max_depth:
-                continue
+        # Уровень 0: прямые вызывающие
+        direct = list(start.callers)
+        all_callers = set(direct)
+        files = {node_file[caller_key] for caller_key in direct}
 
-            visited.add(key)
-            node = self.call_graph.get_node(key)
+        # Узел помечается посещённым при добавлении в уровень, поэтому каждый
+        # узел попадает в обход один раз, а не на каждое входящее ребро
+        visited = {start_key}
+        frontier = []
+        for caller_key in direct:
+            if caller_key not in visited:
+                visited.add(caller_key)
+                frontier.append(caller_key)
+
+        # Уровни 1..max_depth: транзитивные вызывающие
+        for _ in range(self.config.max_depth):
+            next_frontier = []
+
+            for key in frontier:
+                node = get_node(key)
+
+                if not node:
+                    continue
 
-            if not node:
-                continue
+                for caller_key in node.callers:
+                    all_callers.add(caller_key)
+                    files.add(node_file[caller_key])
 
-            for caller_key in node["callers"]:
-                if depth == 0:
-                    direct.append(caller_key)
+                    if caller_key not in visited:
+                        visited.add(caller_key)
+                        next_frontier.append(caller_key)
 
-                all_callers.add(caller_key)
-                files.add(caller_key.split(":")[0])
-                queue.append((caller_key, depth + 1))
+            frontier = next_frontier
 
         return direct, all_callers, files
 
@@ -88,11 +102,11 @@ class ImpactAnalyzer:
             if node:
                 caller_infos.append(
                     CallerInfo(
-                        file=node["file"],
-                        line=node["line"],
-                        end_line=node["end_line"],
-                        name=node["name"],
-                        code=node["code"],
+                        file=node.file,
+                        line=node.line,
+                        end_line=node.end_line,
+                        name=node.name,
+                        code=node.code,
                     )
                 )
 
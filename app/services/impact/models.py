@@ -1,20 +1,10 @@
 """Модели данных для импакт-анализа."""
 
-from dataclasses import dataclass
+from array import array
+from dataclasses import dataclass, field
 
 
-@dataclass
-class FunctionInfo:
-    """Информация о функции."""
-
-    name: str
-    line: int
-    end_line: int
-    code: str
-    calls: list[str]
-
-
-@dataclass
+@dataclass(slots=True)
 class DependencyInfo:
     """Информация о зависимости."""
 
@@ -22,7 +12,7 @@ class DependencyInfo:
     is_external: bool
 
 
-@dataclass
+@dataclass(slots=True)
 class CallerInfo:
     """Информация о вызывающей функции."""
 
@@ -33,7 +23,7 @@ class CallerInfo:
     code: str
 
 
-@dataclass
+@dataclass(slots=True)
 class EntityImpact:
     """Результат анализа импакта для одной сущности."""
 
@@ -44,9 +34,31 @@ class EntityImpact:
     affected_files: list[str]
 
 
-@dataclass
+@dataclass(slots=True)
 class ParsedFile:
-    """Результат парсинга файла."""
-
-    functions: list[FunctionInfo]
-    dependencies: list[DependencyInfo]
+    """
+    Результат парсинга файла.
+
+    Функции хранятся по столбцам: i-я функция - это names[i], lines[i],
+    end_lines[i], codes[i], а её вызовы -
+    calls_names[calls_indptr[i] : calls_indptr[i + 1]].
+    """
+
+    names: list[str] = field(default_factory=list)
+    lines: array = field(default_factory=lambda: array("i"))
+    end_lines: array = field(default_factory=lambda: array("i"))
+    codes: list[str] = field(default_factory=list)
+    calls_indptr: array = field(default_factory=lambda: array("i", [0]))
+    calls_names: list[str] = field(default_factory=list)
+    dependencies: list[DependencyInfo] = field(default_factory=list)
+
+    def add_function(
+        self, name: str, line: int, end_line: int, code: str, calls: list[str]
+    ) -> None:
+        """Добавить функцию в столбцы."""
+        self.names.append(name)
+        self.lines.append(line)
+        self.end_lines.append(end_line)
+        self.codes.append(code)
+        self.calls_names.extend(calls)
+        self.calls_indptr.append(len(self.calls_names))
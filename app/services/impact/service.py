@@ -1,8 +1,10 @@
 """Главный сервис импакт-анализа (фасад)."""
 
-import os
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 
+from app.services.parsed_file_provider import ParsedFileProvider
 from .models import EntityImpact, ParsedFile
 from .config import ImpactConfig
 from .file_scanner import FileScanner
@@ -16,9 +18,17 @@ logger = logging.getLogger(__name__)
 class ImpactService:
     """Сервис для анализа импакта изменённых сущностей."""
 
-    def __init__(self, repo_path: str, config: ImpactConfig | None = None):
+    def __init__(
+        self,
+        repo_path: str,
+        config: ImpactConfig | None = None,
+        provider: ParsedFileProvider | None = None,
+    ):
         self.repo_path = repo_path
         self.config = config if config is not None else ImpactConfig()
+        self.provider = (
+            provider if provider is not None else ParsedFileProvider(repo_path)
+        )
 
         self.scanner = FileScanner(repo_path, self.config)
         self.parser = ASTParser(self.config)
@@ -68,25 +78,40 @@ class ImpactService:
         return result
 
     def _scan_and_parse(self) -> None:
-        """Сканировать и парсить все файлы проекта."""
-        files = self.scanner.scan()
-
-        for file_path in files:
-            full_path = os.path.join(self.repo_path, file_path)
+        """
+        Сканировать и парсить все файлы проекта.
 
-            try:
-                with open(full_path, encoding="utf-8") as f:
-                    content = f.read()
+        Файлы обрабатываются в пуле потоков: чтение файлов и парсинг
+        tree-sitter выполняются в C-коде, а дерево и запросы не нужно
+        сериализовать между процессами.
+        """
+        files = self.scanner.scan()
 
-                filename = os.path.basename(file_path)
-                parsed = self.parser.parse_file(content, filename)
-                self._file_analysis[file_path] = parsed
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            parsed = executor.map(self._parse_one, files)
 
-            except Exception as e:
-                logger.debug(f"Failed to parse {file_path}: {e}")
+            for file_path, parsed_file in zip(files, parsed):
+                if parsed_file is not None:
+                    self._file_analysis[file_path] = parsed_file
 
         logger.info(f"[Impact] Parsed {len(self._file_analysis)} files")
 
+    def _parse_one(self, file_path: str) -> ParsedFile | None:
+        """Распарсить один файл проекта. None, если файл пропущен."""
+        try:
+            # Изменённые файлы уже распарсены EntityService - берём дерево из кэша.
+            # Остальные файлы проекта не сохраняем, чтобы не вытеснять изменённые.
+            result = self.provider.get_parsed(file_path, store=False)
+            if result is None:
+                return None
+
+            _, tree, lang = result
+            return self.parser.parse_file(tree, lang)
+
+        except Exception as e:
+            logger.debug(f"Failed to parse {file_path}: {e}")
+            return None
+
     def _log_impacts(self, impacts: list[EntityImpact], file_path: str) -> None:
         """Логировать информацию об импактах."""
         for impact in impacts:
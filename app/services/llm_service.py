@@ -1,7 +1,15 @@
 """Сервис LLM для ревью кода."""
 
+import asyncio
+import hashlib
 import logging
-from openai import AsyncOpenAI
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import orjson
+from openai import AsyncOpenAI, AsyncStream
 
 from app.services.budget_tracker import BudgetTracker
 
@@ -11,11 +19,36 @@ logger = logging.getLogger(__name__)
 class LLMService:
     """Сервис для взаимодействия с LLM."""
 
-    def __init__(self, client: AsyncOpenAI, model: str, budget_tracker: BudgetTracker):
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        model: str,
+        budget_tracker: BudgetTracker,
+        max_concurrency: int = 8,
+        cache_dir: Path | None = None,
+    ):
+        """
+        Args:
+            client: клиент OpenAI-совместимого API
+            model: модель LLM
+            budget_tracker: трекер использования токенов
+            max_concurrency: максимум одновременных запросов к LLM
+            cache_dir: папка кэша ответов между запусками (None - без кэша)
+        """
         self.client = client
         self.model = model
         self.budget_tracker = budget_tracker
 
+        # Общий лимит для всех запросов сервиса, с какого бы шага они ни шли
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        # Запросы в работе: {blake2b(prompt)|model: future ответа}. Запись
+        # удаляется по завершении, поэтому словарь не растёт дольше очереди
+        self._inflight: dict[str, asyncio.Future[tuple[str, dict]]] = {}
+
+        # Ответы прошлых запусков: по файлу на ключ blake2b(prompt)|model
+        self._cache_dir = cache_dir
+
     async def send(self, prompt: str) -> tuple[str, dict]:
         """
         Отправить промпт в LLM и вернуть ответ со статистикой использования.
@@ -25,34 +58,168 @@ class LLMService:
             - prompt_tokens: количество входных токенов
             - completion_tokens: количество выходных токенов
             - total_tokens: всего использовано токенов
+
+            Если такой же промпт для той же модели уже отправлен и ответ ещё
+            не пришёл, запрос к API не повторяется: вызов ждёт тот же ответ.
+            Ответ из кэша прошлых запусков тоже не требует запроса. В обоих
+            случаях usage нулевой и в бюджете не учитывается.
         """
-        logger.info("Sending prompt to LLM...")
+        digest = hashlib.blake2b(prompt.encode(), digest_size=16).hexdigest()
+        key = f"{digest}|{self.model}"
 
-        completion = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            temperature=0.7,
-        )
+        pending = self._inflight.get(key)
+        if pending is not None:
+            # shield: отмена ожидающего не должна отменять чужой запрос
+            response, usage = await asyncio.shield(pending)
+            logger.info(
+                f"Identical prompt already in flight, "
+                f"{usage.get('prompt_tokens', 0):,} input tokens saved"
+            )
+            usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            return response, usage
 
-        response = completion.choices[0].message.content or ""
+        future = asyncio.ensure_future(self._request(prompt, key))
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await future
 
-        usage = {
-            "prompt_tokens": completion.usage.prompt_tokens if completion.usage else 0,
-            "completion_tokens": completion.usage.completion_tokens
-            if completion.usage
-            else 0,
-            "total_tokens": completion.usage.total_tokens if completion.usage else 0,
-        }
+    async def _request(self, prompt: str, key: str) -> tuple[str, dict]:
+        """Взять ответ из кэша или собрать потоковый ответ LLM целиком."""
+        cache_path = self._cache_path(key)
 
-        self.budget_tracker.add_usage(
-            usage["prompt_tokens"], usage["completion_tokens"]
-        )
+        if cache_path is not None:
+            cached = await asyncio.to_thread(self._load_cached, cache_path, key)
+            if cached is not None:
+                logger.info("Using cached LLM response")
+                usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+                return cached, usage
 
-        logger.info("Received response from LLM\n")
+        usage: dict = {}
+        async with self.send_stream(prompt, usage) as chunks:
+            parts = [part async for part in chunks]
+        response = "".join(parts)
+
+        if cache_path is not None:
+            await asyncio.to_thread(self._store_cached, cache_path, key, response)
 
         return response, usage
+
+    def _cache_path(self, key: str) -> Path | None:
+        """Файл кэша для ключа (имя модели может содержать "/", поэтому хэш)."""
+        if self._cache_dir is None:
+            return None
+        name = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return self._cache_dir / f"{name}.json"
+
+    @staticmethod
+    def _load_cached(path: Path, key: str) -> str | None:
+        """Прочитать ответ из кэша; битый или чужой файл считается промахом."""
+        try:
+            entry = orjson.loads(path.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+
+        if not isinstance(entry, dict) or entry.get("key") != key:
+            return None
+
+        response = entry.get("response")
+        return response if isinstance(response, str) else None
+
+    @staticmethod
+    def _store_cached(path: Path, key: str, response: str) -> None:
+        """Записать ответ в кэш (через временный файл, чтобы не было обрезков)."""
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_bytes(orjson.dumps({"key": key, "response": response}))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to store LLM response in cache: {e}")
+
+    async def send_many(self, prompts: list[str]) -> list[tuple[str, dict]]:
+        """
+        Отправить промпты параллельно (не больше max_concurrency одновременно).
+
+        Returns:
+            Список (response_text, usage_dict) в порядке промптов
+        """
+        return await asyncio.gather(*[self.send(prompt) for prompt in prompts])
+
+    @asynccontextmanager
+    async def send_stream(
+        self, prompt: str, usage: dict | None = None
+    ) -> AsyncIterator[AsyncIterator[str]]:
+        """
+        Отправить промпт в LLM и отдавать ответ частями по мере генерации.
+
+        Контекстный менеджер: слот семафора занят до выхода из блока `async
+        with`, поэтому прерванное чтение (break, исключение) не держит слот,
+        а поток ответа закрывается и usage всё равно учитывается.
+
+            async with llm_service.send_stream(prompt) as chunks:
+                async for chunk in chunks:
+                    ...
+
+        Args:
+            prompt: промпт
+            usage: словарь, который при выходе из блока заполняется
+                статистикой использования (как в `send`)
+
+        Yields:
+            асинхронный итератор фрагментов текста ответа
+        """
+        completion_usage = None
+
+        async def read_chunks(stream: AsyncStream) -> AsyncIterator[str]:
+            nonlocal completion_usage
+            async for chunk in stream:
+                if chunk.usage:
+                    completion_usage = chunk.usage
+
+                if chunk.choices:
+                    content = chunk.choices[0].delta.content
+                    if content:
+                        yield content
+
+        async with self._semaphore:
+            logger.info("Sending prompt to LLM...")
+
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": prompt,
+                    }
+                ],
+                temperature=0.7,
+                stream=True,
+                # Последний чанк потока содержит статистику токенов
+                stream_options={"include_usage": True},
+            )
+
+            try:
+                yield read_chunks(stream)
+            finally:
+                # Недочитанный поток держит HTTP-соединение - закрываем явно
+                await stream.close()
+
+                stats = {
+                    "prompt_tokens": completion_usage.prompt_tokens
+                    if completion_usage
+                    else 0,
+                    "completion_tokens": completion_usage.completion_tokens
+                    if completion_usage
+                    else 0,
+                    "total_tokens": completion_usage.total_tokens
+                    if completion_usage
+                    else 0,
+                }
+                if usage is not None:
+                    usage.update(stats)
+
+                self.budget_tracker.add_usage(
+                    stats["prompt_tokens"], stats["completion_tokens"]
+                )
+
+        logger.info("Received response from LLM\n")
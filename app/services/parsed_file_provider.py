@@ -0,0 +1,93 @@
+"""Общий источник прочитанных и распарсенных файлов репозитория."""
+
+import logging
+import os
+from pathlib import Path
+
+from tree_sitter import Tree
+
+from app.constants import LANGUAGE_MAP
+from app.services._parse_cache import get_parser
+
+logger = logging.getLogger(__name__)
+
+# Обратный маппинг для определения языка одним поиском по словарю: {".ts": "typescript"}
+_EXT_TO_LANG = {f".{ext}": lang for ext, lang in LANGUAGE_MAP.items()}
+
+
+def _read_file(path: str) -> bytes:
+    """
+    Прочитать файл целиком одним системным вызовом.
+
+    Без буферизованного ввода-вывода: размер известен из fstat, поэтому
+    для типичного исходника хватает одного os.read.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        data = os.read(fd, size)
+
+        # os.read может вернуть меньше запрошенного - дочитываем остаток
+        while len(data) < size:
+            chunk = os.read(fd, size - len(data))
+            if not chunk:
+                break
+            data += chunk
+
+        return data
+    finally:
+        os.close(fd)
+
+
+class ParsedFileProvider:
+    """
+    Чтение и парсинг файлов репозитория за один проход.
+
+    Один экземпляр передаётся в EntityService и ImpactService, поэтому
+    изменённый файл читается и парсится один раз для обоих сервисов.
+    """
+
+    def __init__(self, repo_path: str):
+        self.repo_path = Path(repo_path)
+        self._root = str(self.repo_path)
+
+        # Сохранённые файлы (store=True): повторно не читаются с диска
+        self._parsed: dict[str, tuple[bytes, Tree, str]] = {}
+
+    def detect_language(self, file_path: str) -> str | None:
+        """Определить язык tree-sitter по расширению файла."""
+        return _EXT_TO_LANG.get(os.path.splitext(file_path)[1])
+
+    def get_parsed(
+        self, file_path: str, store: bool = True
+    ) -> tuple[bytes, Tree, str] | None:
+        """
+        Прочитать и распарсить файл.
+
+        Args:
+            file_path: путь к файлу относительно репозитория
+            store: сохранить результат для следующих потребителей
+
+        Returns:
+            (содержимое, дерево, язык) или None, если язык не поддерживается
+            или файл не удалось прочитать
+        """
+        cached = self._parsed.get(file_path)
+        if cached is not None:
+            return cached
+
+        lang = self.detect_language(file_path)
+        if not lang:
+            return None
+
+        try:
+            content = _read_file(os.path.join(self._root, file_path))
+        except OSError as e:
+            logger.debug(f"Failed to read {file_path}: {e}")
+            return None
+
+        result = content, get_parser(lang).parse(content), lang
+        if store:
+            self._parsed[file_path] = result
+
+        return result
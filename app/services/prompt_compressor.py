@@ -0,0 +1,109 @@
+"""Сжатие промптов перед отправкой в LLM."""
+
+import re
+
+# Уровни сжатия
+NO_COMPRESSION = 0
+WHITESPACE = 1  # пробелы и пустые строки
+COMMENTS = 2  # + строки-комментарии в блоках кода
+
+_FENCE = "```"
+_SPACES_RE = re.compile(r"[ \t]{2,}")
+_NUMBERED_LINE_RE = re.compile(r"^\d+\| ")
+
+
+def compress(text: str, level: int = WHITESPACE) -> str:
+    """
+    Сжать промпт, убрав символы, не влияющие на ревью.
+
+    - WHITESPACE: вне блоков кода схлопываются повторяющиеся пробелы и пустые
+      строки; в блоках кода убираются пробелы в конце строк.
+    - COMMENTS: дополнительно в блоках кода убираются строки, целиком
+      состоящие из комментария: `// ...`, `/* ... */` без кода после него
+      и строки внутри многострочного `/* ... */` (номера остальных строк
+      сохраняются).
+
+    Блоки ```diff не меняются: в них важен каждый символ изменения.
+
+    Args:
+        text: промпт
+        level: уровень сжатия (0 - без изменений)
+
+    Returns:
+        сжатый промпт
+    """
+    if level <= NO_COMPRESSION:
+        return text
+
+    result = []
+    fence = None  # язык текущего блока кода или None вне блока
+    in_comment = False  # внутри многострочного /* ... */
+    prev_blank = False
+
+    for line in text.split("\n"):
+        if line.startswith(_FENCE):
+            fence = None if fence is not None else line[len(_FENCE) :].strip()
+            in_comment = False
+            result.append(line)
+            prev_blank = False
+            continue
+
+        if fence == "diff":
+            result.append(line)
+            continue
+
+        if fence is not None:
+            line = line.rstrip()
+            if level >= COMMENTS:
+                is_comment, in_comment = _comment_line(line, in_comment)
+                if is_comment:
+                    continue
+            result.append(line)
+            continue
+
+        # Текст вне блоков кода: отступ сохраняем, остальные пробелы схлопываем
+        content = line.lstrip()
+        indent = line[: len(line) - len(content)]
+        line = (indent + _SPACES_RE.sub(" ", content)).rstrip()
+        if not line:
+            if prev_blank:
+                continue
+            prev_blank = True
+        else:
+            prev_blank = False
+        result.append(line)
+
+    return "\n".join(result)
+
+
+def _comment_line(line: str, in_comment: bool) -> tuple[bool, bool]:
+    """
+    Проверить, что строка кода (возможно, с номером) - только комментарий.
+
+    Args:
+        line: строка блока кода
+        in_comment: строка начинается внутри многострочного /* ... */
+
+    Returns:
+        (строка - только комментарий, следующая строка внутри /* ... */)
+    """
+    match = _NUMBERED_LINE_RE.match(line)
+    code = (line[match.end() :] if match else line).strip()
+
+    if in_comment:
+        end = code.find("*/")
+        if end == -1:
+            return True, True
+        # Комментарий закончился - строку убираем, только если после него нет кода
+        return not code[end + 2 :].strip(), False
+
+    if code.startswith("//"):
+        return True, False
+
+    if code.startswith("/*"):
+        end = code.find("*/", 2)
+        if end == -1:
+            return True, True
+        return not code[end + 2 :].strip(), False
+
+    return False, False
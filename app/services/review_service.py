@@ -1,15 +1,17 @@
 """Сервис ревью для форматирования данных в промпты."""
 
+import io
 import logging
 
+from app.services.prompt_compressor import compress, WHITESPACE
 from app.services.prompts import SYSTEM_PROMPT
+from app.services.tokenizer import count_tokens
 
 logger = logging.getLogger(__name__)
 
 
 # Константы для форматирования
 STAGE_SEPARATOR = "\n\n---\n\n"
-SYSTEM_PROMPT_OVERHEAD = 50  # Доп. символы для разделителей
 
 
 class ReviewService:
@@ -96,133 +98,147 @@ class ReviewService:
             for block in local_code
         ]
 
-    def format_prompts(self, stages: list, budget_chars: int) -> list[str]:
+    def format_prompts(
+        self,
+        stages: list,
+        budget_tokens: int,
+        model: str,
+        compression_level: int = WHITESPACE,
+    ) -> list[str]:
         """
         Превратить stages в паки промптов.
 
-        1. Каждый stage -> текстовый промпт
-        2. Склеивание промптов в паки по budget_chars
+        1. Каждый stage -> текстовый промпт (сжатый до упаковки,
+           чтобы в бюджет поместилось больше stages)
+        2. Склеивание промптов в паки по budget_tokens (токенизатор модели)
         3. Добавление системного промпта к каждому паку
 
         Returns:
             Список строк-промптов (паков)
         """
         # Шаг 1: stage -> текст
-        stage_prompts = [self._stage_to_prompt(stage) for stage in stages]
+        stage_prompts = [
+            compress(self._stage_to_prompt(stage), compression_level)
+            for stage in stages
+        ]
 
         # Шаг 2: склеивание в паки
-        packs = self._pack_prompts(stage_prompts, budget_chars)
+        packs = self._pack_prompts(stage_prompts, budget_tokens, model)
 
         # Шаг 3: добавляем системный промпт к каждому паку
         return [SYSTEM_PROMPT + STAGE_SEPARATOR + pack for pack in packs]
 
-    def _pack_prompts(self, stage_prompts: list[str], budget_chars: int) -> list[str]:
-        """Упаковать промпты в паки с учётом бюджета."""
+    def _pack_prompts(
+        self, stage_prompts: list[str], budget_tokens: int, model: str
+    ) -> list[str]:
+        """Упаковать промпты в паки с учётом бюджета токенов."""
         packs = []
-        current_pack = ""
-        system_size = len(SYSTEM_PROMPT) + SYSTEM_PROMPT_OVERHEAD
+        current_pack: list[str] = []
+        current_tokens = 0
+        system_tokens = count_tokens(SYSTEM_PROMPT + STAGE_SEPARATOR, model)
+        separator_tokens = count_tokens(STAGE_SEPARATOR, model)
 
         for prompt in stage_prompts:
-            if len(current_pack) + len(prompt) + system_size > budget_chars:
+            prompt_tokens = count_tokens(prompt, model)
+
+            if (
+                current_pack
+                and system_tokens + current_tokens + separator_tokens + prompt_tokens
+                > budget_tokens
+            ):
                 # Пак заполнен, начинаем новый
-                if current_pack:
-                    packs.append(current_pack)
-                current_pack = prompt
-            else:
-                # Добавляем в текущий пак
-                if current_pack:
-                    current_pack += STAGE_SEPARATOR
-                current_pack += prompt
+                packs.append(STAGE_SEPARATOR.join(current_pack))
+                current_pack = []
+                current_tokens = 0
+
+            # Добавляем в текущий пак
+            if current_pack:
+                current_tokens += separator_tokens
+            current_pack.append(prompt)
+            current_tokens += prompt_tokens
 
         # Добавляем последний пак
         if current_pack:
-            packs.append(current_pack)
+            packs.append(STAGE_SEPARATOR.join(current_pack))
 
         return packs
 
     def _stage_to_prompt(self, stage: dict) -> str:
         """Превратить stage в текстовый промпт."""
-        lines = [f"# File: {stage['file']} [{stage['status']}]", ""]
+        out = io.StringIO()
+        out.write(f"# File: {stage['file']} [{stage['status']}]\n\n")
 
-        lines.extend(self._format_diff_section(stage))
-        lines.extend(self._format_local_code_section(stage))
-        lines.extend(self._format_exports_section(stage))
+        self._format_diff_section(stage, out)
+        self._format_local_code_section(stage, out)
+        self._format_exports_section(stage, out)
 
-        return "\n".join(lines)
+        # Каждая строка пишется с переводом строки - последний лишний
+        return out.getvalue()[:-1]
 
-    def _format_diff_section(self, stage: dict) -> list[str]:
+    def _format_diff_section(self, stage: dict, out: io.StringIO) -> None:
         """Форматировать секцию с diff."""
         if not stage["diff"]:
-            return []
+            return
 
-        return ["## Changes (diff)", "```diff", stage["diff"], "```", ""]
+        out.write(f"## Changes (diff)\n```diff\n{stage['diff']}\n```\n\n")
 
-    def _format_local_code_section(self, stage: dict) -> list[str]:
+    def _format_local_code_section(self, stage: dict, out: io.StringIO) -> None:
         """Форматировать секцию с локальным кодом."""
         if not stage["local_changes"]:
-            return []
+            return
 
-        lines = [
-            "## Full Local Code Context",
-            "",
-            f"The complete code of modified entities for full context ({stage['file']}):",
-            "",
-        ]
+        out.write(
+            "## Full Local Code Context\n\n"
+            f"The complete code of modified entities for full context ({stage['file']}):\n\n"
+        )
 
         for i, change in enumerate(stage["local_changes"], 1):
-            lines.append(
-                f"### Code Block {i} (lines {change['start_line']}-{change['end_line']})"
+            out.write(
+                f"### Code Block {i} (lines {change['start_line']}-{change['end_line']})\n"
             )
-            lines.extend(self._format_code_block(change["code"], change["start_line"]))
-            lines.append("")
+            self._format_code_block(change["code"], change["start_line"], out)
+            out.write("\n")
 
-        return lines
-
-    def _format_exports_section(self, stage: dict) -> list[str]:
+    def _format_exports_section(self, stage: dict, out: io.StringIO) -> None:
         """Форматировать секцию с экспортами и их использованием."""
         if not stage["changed_exports"]:
-            return []
+            return
 
-        lines = ["## Changed Exports & Their Usage"]
+        out.write("## Changed Exports & Their Usage\n")
 
         for entity in stage["changed_exports"]:
-            lines.append(f"### {entity['name']}")
+            out.write(f"### {entity['name']}\n")
 
             if entity["impact"]:
-                lines.extend(self._format_impact_info(entity["impact"]))
+                self._format_impact_info(entity["impact"], out)
             else:
-                lines.append("- No impact data")
-
-            lines.append("")
+                out.write("- No impact data\n")
 
-        return lines
+            out.write("\n")
 
-    def _format_impact_info(self, impact: dict) -> list[str]:
+    def _format_impact_info(self, impact: dict, out: io.StringIO) -> None:
         """Форматировать информацию об impact."""
-        lines = [
-            f"- **Usage count:** {impact['usage_count']} (direct: {impact['direct_usage_count']})",
-            f"- **Affected files:** {len(impact['affected_files'])}",
-        ]
+        out.write(
+            f"- **Usage count:** {impact['usage_count']} (direct: {impact['direct_usage_count']})\n"
+            f"- **Affected files:** {len(impact['affected_files'])}\n"
+        )
 
         if impact["direct_callers"]:
-            lines.append("")
-            lines.append("**Direct callers:**")
+            out.write("\n**Direct callers:**\n")
 
             for caller in impact["direct_callers"]:
-                lines.append(
-                    f"- `{caller['file']}:{caller['line']}-{caller['end_line']}` - {caller['name']}"
+                out.write(
+                    f"- `{caller['file']}:{caller['line']}-{caller['end_line']}` - {caller['name']}\n"
                 )
-                lines.extend(self._format_code_block(caller["code"], caller["line"]))
-
-        return lines
+                self._format_code_block(caller["code"], caller["line"], out)
 
-    def _format_code_block(self, code: str, start_line: int) -> list[str]:
+    def _format_code_block(self, code: str, start_line: int, out: io.StringIO) -> None:
         """Форматировать блок кода с номерами строк."""
-        numbered_code = self._add_line_numbers(code, start_line)
-        return ["```typescript", numbered_code, "```"]
+        out.write("```typescript\n")
+        self._add_line_numbers(code, start_line, out)
+        out.write("```\n")
 
-    def _add_line_numbers(self, code: str, start_line: int) -> str:
+    def _add_line_numbers(self, code: str, start_line: int, out: io.StringIO) -> None:
         """Добавить номера строк к коду."""
-        lines = code.split("\n")
-        numbered = [f"{start_line + i}| {line}" for i, line in enumerate(lines)]
-        return "\n".join(numbered)
+        for i, line in enumerate(code.split("\n"), start_line):
+            out.write(f"{i}| {line}\n")
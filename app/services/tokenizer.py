@@ -0,0 +1,43 @@
+"""Подсчёт токенов для бюджетирования промптов."""
+
+import logging
+from functools import lru_cache
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Кодировка для моделей, которых нет в tiktoken (локальные и прокси LLM)
+FALLBACK_ENCODING = "o200k_base"
+
+# Оценка длины токена, если кодировку загрузить не удалось
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def get_encoding(model: str) -> tiktoken.Encoding | None:
+    """
+    Получить кодировку tiktoken для модели (загружается один раз).
+
+    При первом обращении tiktoken скачивает файл BPE; если это не удалось
+    (нет сети, нет кэша в TIKTOKEN_CACHE_DIR), возвращает None.
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding(FALLBACK_ENCODING)
+    except Exception as e:
+        logger.warning(
+            f"Failed to load tiktoken encoding for {model} ({e}); "
+            f"estimating tokens as {CHARS_PER_TOKEN} characters each"
+        )
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Посчитать количество токенов в тексте для модели."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,86 @@
+"""Тесты GitService: сопоставление кусков патча с файлами."""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from git import Repo
+
+from app.services.git_service import GitService
+
+
+class GetBranchDiffTest(unittest.TestCase):
+    """get_branch_diff на ветке со сменой типа файла и переименованием."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name)
+        repo = Repo.init(self.path, initial_branch="main")
+        with repo.config_writer() as config:
+            config.set_value("user", "name", "test")
+            config.set_value("user", "email", "test@example.com")
+
+        self._write("s.sh", "echo one\necho two\n")
+        self._write("z.ts", "const a = 1;\nconst b = 2;\nconst c = 3;\n")
+        self._write("old.ts", "".join(f"export const v{i} = {i};\n" for i in range(10)))
+        self._write("ü b.ts", "let x = 1;\n")
+        repo.git.add(A=True)
+        repo.index.commit("base")
+
+        repo.git.checkout("-b", "feat")
+        os.remove(self.path / "s.sh")
+        os.symlink("z.ts", self.path / "s.sh")  # T: файл -> симлинк
+        self._write("z.ts", "const a = 1;\nconst b = 2;\nconst c = 30;\n")
+        repo.git.mv("old.ts", "new.ts")
+        self._write(
+            "new.ts",
+            "".join(f"export const v{i} = {i};\n" for i in range(9)) + "export const v9 = 99;\n",
+        )
+        self._write("ü b.ts", "let x = 2;\n")
+        repo.git.add(A=True)
+        repo.index.commit("change")
+        self.repo = repo
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _write(self, name: str, content: str) -> None:
+        (self.path / name).write_text(content)
+
+    def test_chunks_are_matched_by_path(self):
+        self._assert_matched_by_path()
+
+    def test_noprefix_config(self):
+        # Пользовательский diff.noprefix убирает a/ и b/ из заголовков патча
+        with self.repo.config_writer() as config:
+            config.set_value("diff", "noprefix", "true")
+
+        self._assert_matched_by_path()
+
+    def _assert_matched_by_path(self) -> None:
+        result = GitService(str(self.path)).get_branch_diff("feat", "main")
+        files = {f.path: f for f in result.files}
+
+        self.assertEqual(set(files), {"s.sh", "z.ts", "new.ts", "ü b.ts"})
+
+        # Смена типа даёт два куска патча - оба относятся к s.sh
+        self.assertEqual(files["s.sh"].status, "T")
+        self.assertEqual(files["s.sh"].diff.count("diff --git "), 2)
+        self.assertIn("-echo two", files["s.sh"].diff)
+
+        # Следующий файл получает свой патч, а не хвост патча s.sh
+        self.assertEqual(files["z.ts"].status, "M")
+        self.assertIn("+const c = 30;", files["z.ts"].diff)
+        self.assertNotIn("echo", files["z.ts"].diff)
+        self.assertEqual(files["z.ts"].hunks, [(1, 3)])
+
+        self.assertEqual(files["new.ts"].status, "R")
+        self.assertIn("rename to new.ts", files["new.ts"].diff)
+        self.assertIn("+export const v9 = 99;", files["new.ts"].diff)
+
+        self.assertIn("+let x = 2;", files["ü b.ts"].diff)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Тесты сжатия промптов: удаляются только строки, целиком состоящие из комментария."""
+
+import unittest
+
+from app.services.prompt_compressor import COMMENTS, NO_COMPRESSION, compress
+
+
+def _code_block(*lines: str, lang: str = "ts") -> str:
+    return "\n".join([f"```{lang}", *lines, "```"])
+
+
+class CompressCommentsTest(unittest.TestCase):
+    """compress на уровне COMMENTS."""
+
+    def test_drops_whole_line_comments(self):
+        text = _code_block(
+            "1| // однострочный",
+            "2| /* закрытый */",
+            "3| /*",
+            "4|  * внутри блока",
+            "5|  */",
+            "6| const a = 1;",
+        )
+
+        self.assertEqual(compress(text, COMMENTS), _code_block("6| const a = 1;"))
+
+    def test_keeps_code_after_inline_comment(self):
+        text = _code_block("10| /* istanbul ignore next */ export function f() {")
+
+        self.assertEqual(compress(text, COMMENTS), text)
+
+    def test_keeps_line_starting_with_multiplication(self):
+        text = _code_block("1| const c = a", "2|   * b;")
+
+        self.assertEqual(compress(text, COMMENTS), text)
+
+    def test_keeps_code_after_multiline_comment(self):
+        text = _code_block(
+            "1| /* начало",
+            "2|    продолжение",
+            "3|    конец */ const x = 1;",
+            "4| const y = 2;",
+        )
+
+        self.assertEqual(
+            compress(text, COMMENTS),
+            _code_block("3|    конец */ const x = 1;", "4| const y = 2;"),
+        )
+
+    def test_diff_block_is_untouched(self):
+        text = _code_block(
+            "@@ -1,2 +1,2 @@",
+            "-// старый комментарий  ",
+            "+/* новый */",
+            " const  a = 1;",
+            lang="diff",
+        )
+
+        self.assertEqual(compress(text, COMMENTS), text)
+
+    def test_level_zero_returns_input(self):
+        text = "Текст   с  пробелами\n\n\n" + _code_block("1| // комментарий   ")
+
+        self.assertEqual(compress(text, NO_COMPRESSION), text)
+
+
+if __name__ == "__main__":
+    unittest.main()